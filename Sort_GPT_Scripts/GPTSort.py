@@ -1,12 +1,14 @@
-import json
-import re
-import shutil
+import hashlib
+import os
 import sys
 import time
 from pathlib import Path
-from slugify import slugify
-from html import unescape
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+from sort_common import (read_json, dump_json, write_bytes, write_json, clean,
+                         iter_conversations, extract_attachments, build_file_index,
+                         materialize, parse_conversation)
 
 # ── CONFIG ───────────────────────────────────────────────────────────
 
@@ -17,209 +19,184 @@ ROOT_DIR     = BASE_DIR / "GPTData"
 CONV_JSON    = ROOT_DIR / "conversations.json"
 ASSETS_JSON  = ROOT_DIR / "assets.json"
 OUT_DIR      = BASE_DIR / "Sorted_GPT_Data"
+MANIFEST     = OUT_DIR / ".manifest.json"  # conv_id → {path, fp, n}
 DELTA_DIR    = BASE_DIR / "delta"
 NEW_DELTA    = DELTA_DIR / "new_chats"
 APPEND_DELTA = DELTA_DIR / "appending"
-MAX_SLUG     = 80
+WORKERS      = os.cpu_count() or 1
+REDRAW_EVERY = 1 / 30  # seconds between progress bar redraws
 
 # ── UTILS ────────────────────────────────────────────────────────────
 
-def clean(name: str) -> str:
-    return slugify(name, max_length=MAX_SLUG) or "untitled"
-
-def extract_msgs(conv: dict, asset_map: dict) -> list[dict]:
-    msgs = []
-    mapping = conv.get("mapping", {})
-    node_id = conv.get("current_node")
-    while node_id:
-        node = mapping.get(node_id)
-        node_id = node.get("parent") if node else None
-        if not node:
-            break
-        msg = node.get("message")
-        if not msg:
-            continue
-        parts = msg.get("content", {}).get("parts") or []
-        if not parts:
-            continue
-        role = msg.get("author", {}).get("role")
-        if role in ("assistant", "tool"):
-            speaker = "assistant"
-        elif role == "user" or (role == "system" and msg.get("metadata", {}).get("is_user_system_message")):
-            speaker = "user"
-        else:
-            continue
-        texts = []
-        for part in parts:
-            if isinstance(part, str):
-                texts.append(part)
-            elif isinstance(part, dict):
-                if part.get("content_type") == "audio_transcription":
-                    texts.append(f"[Transcript]: {part.get('text','')}")
-                elif part.get("asset_pointer"):
-                    ptr = part["asset_pointer"]
-                    url = asset_map.get(ptr)
-                    fname = Path(url).name if url else None
-                    texts.append(f"[File]: {fname or 'MISSING'}")
-        content = "\n\n".join(texts).strip()
-        timestamp = msg.get("create_time")
-        model = msg.get("metadata", {}).get("model_slug")
-        msgs.append({
-            "role": speaker,
-            "content": content,
-            "timestamp": timestamp,
-            "model": model
-        })
-    return list(reversed(msgs))
-
-def extract_attachments(messages: list[dict]) -> list[str]:
-    attachments = set()
-    for msg in messages:
-        for line in msg["content"].splitlines():
-            m = re.match(r"^\[File\]:\s*([\w .()\[\]\-]+)$", line)
-            if m:
-                attachments.add(m.group(1))
-            else:
-                break
-    return sorted(attachments)
-
-def find_file(filename: str, root: Path) -> Path | None:
-    return next(root.rglob(filename), None)
-
-def clean_content(messages: list[dict]) -> None:
-    for msg in messages:
-        msg["content"] = unescape(msg["content"]).replace("\uFFFD", "'")
-
-def group_messages(msgs: list[dict]) -> list[dict]:
-    if not msgs:
-        return []
-    grouped = []
-    curr = msgs[0].copy()
-    for m in msgs[1:]:
-        if m["role"] == curr["role"]:
-            curr["content"] += "\n\n" + m["content"]
-        else:
-            grouped.append(curr)
-            curr = m.copy()
-    grouped.append(curr)
-    return grouped
+_made_dirs: set[Path] = set()
 
-def progress_bar(i, total, note=""):
-    bar_len = 40
-    filled = int(bar_len * i / total)
-    bar = "#" * filled + "-" * (bar_len - filled)
-    print(f"\r[{bar}] {i}/{total} {note}", end="", flush=True)
+def ensure(p: Path) -> Path:
+    """mkdir -p, once per path per process."""
+    if p not in _made_dirs:
+        p.mkdir(parents=True, exist_ok=True)
+        _made_dirs.add(p)
+    return p
 
-# ── MAIN ─────────────────────────────────────────────────────────────
+STATUS_NOTES = {
+    "truncated": "🔹 skipped (truncated)",
+    "same":      "🔹 skipped (same)",
+    "updated":   "✅ updated",
+    "added":     "✨ added",
+    "error":     "❌ error",
+}
 
-def main():
-    if not CONV_JSON.exists() or not ASSETS_JSON.exists():
-        print("❌ Missing conversations.json or assets.json. (run extractor.py)")
-        return
+def fingerprint(hashes: list[str]) -> str:
+    """Digest of a whole message list, from its message_hashes()."""
+    return hashlib.blake2b("\n".join(hashes).encode(), digest_size=16).hexdigest()
 
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    NEW_DELTA.mkdir(parents=True, exist_ok=True)
-    APPEND_DELTA.mkdir(parents=True, exist_ok=True)
+def manifest_entry(conv_id: str, out_json: Path, fp: str, n: int) -> dict:
+    return {conv_id: {"path": out_json.relative_to(OUT_DIR).as_posix(), "fp": fp, "n": n}}
+
+def load_manifest() -> dict[str, dict]:
+    """
+    conv_id → {path, fp, n} for everything already in OUT_DIR.
+    Entries whose folder is gone are dropped; only folders the manifest
+    doesn't know about (first run, single_store.py saves) get read.
+    """
+    manifest = {}
+    if MANIFEST.exists():
+        try:
+            manifest = read_json(MANIFEST)
+        except ValueError:
+            manifest = {}
 
-    convs  = json.loads(CONV_JSON.read_text(encoding="utf-8"))
-    assets = json.loads(ASSETS_JSON.read_text(encoding="utf-8"))
+    with os.scandir(OUT_DIR) as it:
+        folders = {e.name for e in it if "--" in e.name and e.is_dir()}
+    known = set()
+    for conv_id, entry in list(manifest.items()):
+        folder = entry["path"].split("/", 1)[0]
+        if folder in folders:
+            known.add(folder)
+        else:
+            del manifest[conv_id]
 
-    # Index existing by ID
-    existing_ids = {}
-    for folder in OUT_DIR.glob("*--*"):
-        meta_file = next(folder.glob("*.json"), None)
+    for name in folders - known:
+        with os.scandir(OUT_DIR / name) as it:
+            meta_file = next((Path(e.path) for e in it if e.name.endswith(".json")), None)
         if not meta_file:
             continue
         try:
-            data = json.loads(meta_file.read_text(encoding="utf-8"))
-            if "id" in data:
-                existing_ids[data["id"]] = data.get("messages", [])
-        except:
+            data = read_json(meta_file)
+        except Exception:
             continue
+        if "id" in data:
+            msgs = data.get("messages", [])
+            manifest.update(manifest_entry(data["id"], meta_file,
+                                           fingerprint(message_hashes(msgs)), len(msgs)))
+    return manifest
 
-    updated = skipped = 0
-    errors = []
-    total = len(convs)
+def message_hashes(messages: list[dict]) -> list[str]:
+    return [hashlib.blake2b(f'{m["role"]}\x1f{m["timestamp"]!r}\x1f{m["model"]}\x1f{m["content"]}'.encode(),
+                            digest_size=16).hexdigest()
+            for m in messages]
 
-    for idx, conv in enumerate(convs, 1):
-        title    = conv.get("title") or "Untitled"
-        conv_id  = conv.get("conversation_id")
-        clean_title = clean(title)
-        folder_name = f"{clean_title}--{conv_id}"
-        folder = OUT_DIR / folder_name
-        out_json = folder / f"{clean_title}.json"
+def write_index(out_json: Path, hashes: list[str]) -> None:
+    """
+    Writes the per-message hashes of out_json to a .idx sidecar (not .json,
+    so it is never mistaken for the conversation file), stamped with the
+    size and mtime of out_json so an edit by another script invalidates it.
+    """
+    st = out_json.stat()
+    write_json(out_json.with_suffix(".idx"),
+               {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hashes": hashes})
 
-        try:
-            messages = extract_msgs(conv, assets)
-            clean_content(messages)
-            messages = group_messages(messages)
-            attachments = extract_attachments(messages)
-
-            # Append case
-            if conv_id in existing_ids:
-                existing = existing_ids[conv_id]
-                if len(messages) < len(existing):
-                    skipped += 1
-                    progress_bar(idx, total, "🔹 skipped (truncated)")
-                    continue
-                if messages[:len(existing)] == existing:
-                    if len(messages) == len(existing):
-                        skipped += 1
-                        progress_bar(idx, total, "🔹 skipped (same)")
-                        continue
-                    # truly new blocks
-                    delta_msgs = messages[len(existing):]
-                    new_atts   = extract_attachments(delta_msgs)
-
-                    # ensure sorted folder exists and update full JSON
-                    folder.mkdir(parents=True, exist_ok=True)
-                    full_atts = extract_attachments(messages)
-                    with open(out_json, "w", encoding="utf-8") as f:
-                        json.dump({
-                            "title": title,
-                            "id": conv_id,
-                            "create_time": conv.get("create_time"),
-                            "model": conv.get("model"),
-                            "message_count": len(messages),
-                            "attachments": full_atts,
-                            "messages": messages
-                        }, f, ensure_ascii=False, indent=2)
-
-                    # write delta identical format
-                    APPEND_DELTA.mkdir(parents=True, exist_ok=True)
-                    ddir = APPEND_DELTA / folder_name
-                    ddir.mkdir(parents=True, exist_ok=True)
-                    # copy new attachments
-                    for fn in new_atts:
-                        src = find_file(fn, ROOT_DIR)
-                        if src:
-                            shutil.copy(src, ddir / fn)
-                    # dump delta JSON
-                    with open(ddir / f"{clean_title}.json", "w", encoding="utf-8") as df:
-                        json.dump({
-                            "title": title,
-                            "id": conv_id,
-                            "create_time": conv.get("create_time"),
-                            "model": conv.get("model"),
-                            "message_count": len(delta_msgs),
-                            "attachments": new_atts,
-                            "messages": delta_msgs
-                        }, df, ensure_ascii=False, indent=2)
-
-                    updated += 1
-                    progress_bar(idx, total, "✅ updated")
-                    continue
-
-            # New conversation
-            folder.mkdir(parents=True, exist_ok=True)
-            # copy all attachments into sorted
-            for fn in attachments:
-                src = find_file(fn, ROOT_DIR)
-                if src:
-                    shutil.copy(src, folder / fn)
-            # write sorted JSON
-            with open(out_json, "w", encoding="utf-8") as f:
-                json.dump({
+def read_index(out_json: Path) -> list[str] | None:
+    """Stored message hashes for out_json, or None if missing or stale."""
+    try:
+        idx = read_json(out_json.with_suffix(".idx"))
+        st  = out_json.stat()
+    except (OSError, ValueError):
+        return None
+    if (idx.get("size"), idx.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+        return None
+    return idx.get("hashes")
+
+_last_draw = 0.0
+
+def progress_bar(frac, count, note="", force=False):
+    """Redraws at most every REDRAW_EVERY seconds unless forced."""
+    global _last_draw
+    now = time.monotonic()
+    if not force and now - _last_draw < REDRAW_EVERY:
+        return
+    _last_draw = now
+    bar_len = 40
+    filled = int(bar_len * frac)
+    bar = "#" * filled + "-" * (bar_len - filled)
+    print(f"\r[{bar}] {count} {note}", end="", flush=True)
+
+# ── WORKER ───────────────────────────────────────────────────────────
+
+# set once per worker process by init_worker
+_assets     = {}
+_file_index = {}
+
+def init_worker(assets: dict, file_index: dict[str, Path]) -> None:
+    global _assets, _file_index
+    _assets, _file_index = assets, file_index
+
+def sort_conversation(conv: dict, existing: dict | None
+                      ) -> tuple[str, str, str | None, dict | None]:
+    """
+    Sorts one conversation into OUT_DIR and the delta folders.
+    existing is its manifest entry, if it was sorted before.
+    Returns (status, title, error, manifest update); status is one of STATUS_NOTES.
+    """
+    title    = conv.get("title") or "Untitled"
+    conv_id  = conv.get("conversation_id")
+    clean_title = clean(title)
+    folder_name = f"{clean_title}--{conv_id}"
+    folder = OUT_DIR / folder_name
+    out_json = folder / f"{clean_title}.json"
+
+    try:
+        messages, attachments = parse_conversation(conv, _assets)
+        hashes = message_hashes(messages)
+        fp = fingerprint(hashes)
+
+        # Append case
+        if existing is not None:
+            if len(messages) < existing["n"]:
+                return "truncated", title, None, None
+            # matching fingerprints skip loading the old JSON at all
+            if len(messages) == existing["n"] and fp == existing["fp"]:
+                return "same", title, None, None
+            # the .idx sidecar spares decoding the whole stored conversation
+            old_json   = OUT_DIR / existing["path"]
+            old_hashes = read_index(old_json)
+            if old_hashes is not None:
+                n_old  = len(old_hashes)
+                prefix = hashes[:n_old] == old_hashes
+            else:
+                old_msgs = read_json(old_json).get("messages", [])
+                n_old    = len(old_msgs)
+                prefix   = messages[:n_old] == old_msgs
+            if len(messages) < n_old:
+                # the manifest count was stale; the stored copy is longer
+                if old_hashes is None:
+                    old_hashes = message_hashes(old_msgs)
+                    write_index(old_json, old_hashes)
+                return "truncated", title, None, manifest_entry(conv_id, old_json,
+                                                                fingerprint(old_hashes), n_old)
+            if prefix:
+                if len(messages) == n_old:
+                    # the manifest entry was stale (e.g. single_store.py appended);
+                    # refresh it and the sidecar so the next run skips early
+                    if old_hashes is None:
+                        write_index(old_json, hashes)
+                    return "same", title, None, manifest_entry(conv_id, old_json, fp, n_old)
+                # truly new blocks
+                delta_msgs = messages[n_old:]
+                new_atts   = extract_attachments(delta_msgs)
+
+                # ensure sorted folder exists and update full JSON
+                ensure(folder)
+                write_json(out_json, {
                     "title": title,
                     "id": conv_id,
                     "create_time": conv.get("create_time"),
@@ -227,35 +204,114 @@ def main():
                     "message_count": len(messages),
                     "attachments": attachments,
                     "messages": messages
-                }, f, ensure_ascii=False, indent=2)
-
-            # write new chat delta
-            NEW_DELTA.mkdir(parents=True, exist_ok=True)
-            ndir = NEW_DELTA / folder_name
-            ndir.mkdir(parents=True, exist_ok=True)
-            # copy attachments
-            for fn in attachments:
-                src = find_file(fn, ROOT_DIR)
-                if src:
-                    shutil.copy(src, ndir / fn)
-            # dump delta JSON
-            with open(ndir / f"{clean_title}.json", "w", encoding="utf-8") as df:
-                json.dump({
+                })
+                write_index(out_json, hashes)
+
+                # write delta identical format
+                ddir = ensure(APPEND_DELTA / folder_name)
+                # copy new attachments
+                for fn in new_atts:
+                    src = _file_index.get(fn)
+                    if src:
+                        materialize(src, ddir / fn)
+                # dump delta JSON
+                write_json(ddir / f"{clean_title}.json", {
                     "title": title,
                     "id": conv_id,
                     "create_time": conv.get("create_time"),
                     "model": conv.get("model"),
-                    "message_count": len(messages),
-                    "attachments": attachments,
-                    "messages": messages
-                }, df, ensure_ascii=False, indent=2)
+                    "message_count": len(delta_msgs),
+                    "attachments": new_atts,
+                    "messages": delta_msgs
+                })
+                return "updated", title, None, manifest_entry(conv_id, out_json, fp, len(messages))
+
+        # New conversation
+        ensure(folder)
+        # copy all attachments into sorted
+        for fn in attachments:
+            src = _file_index.get(fn)
+            if src:
+                materialize(src, folder / fn)
+        # sorted and delta JSON are identical for a new chat: encode once
+        payload = dump_json({
+            "title": title,
+            "id": conv_id,
+            "create_time": conv.get("create_time"),
+            "model": conv.get("model"),
+            "message_count": len(messages),
+            "attachments": attachments,
+            "messages": messages
+        })
+        write_bytes(out_json, payload)
+        write_index(out_json, hashes)
+
+        # write new chat delta
+        ndir = ensure(NEW_DELTA / folder_name)
+        # copy attachments
+        for fn in attachments:
+            src = _file_index.get(fn)
+            if src:
+                materialize(src, ndir / fn)
+        write_bytes(ndir / f"{clean_title}.json", payload)
+        return "added", title, None, manifest_entry(conv_id, out_json, fp, len(messages))
+
+    except Exception as e:
+        return "error", title, str(e), None
+
+# ── MAIN ─────────────────────────────────────────────────────────────
 
+def main():
+    if not CONV_JSON.exists() or not ASSETS_JSON.exists():
+        print("❌ Missing conversations.json or assets.json. (run extractor.py)")
+        return
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    NEW_DELTA.mkdir(parents=True, exist_ok=True)
+    APPEND_DELTA.mkdir(parents=True, exist_ok=True)
+
+    assets = read_json(ASSETS_JSON)
+    file_index = build_file_index(ROOT_DIR)
+
+    manifest = load_manifest()
+
+    updated = skipped = done = 0
+    errors = []
+    frac = 0.0
+    note = ""
+
+    def tally(future):
+        nonlocal updated, skipped, done, note
+        status, title, error, entry = future.result()
+        done += 1
+        if entry:
+            manifest.update(entry)
+        if status in ("updated", "added"):
             updated += 1
-            progress_bar(idx, total, "✨ added")
+        elif status == "error":
+            errors.append((title, error))
+        else:
+            skipped += 1
+        note = STATUS_NOTES[status]
+        progress_bar(frac, done, note)
+
+    # conversations are independent once assets/file_index/manifest are
+    # built; keep a bounded number in flight so streaming still caps memory
+    with ProcessPoolExecutor(max_workers=WORKERS, initializer=init_worker,
+                             initargs=(assets, file_index)) as pool:
+        pending = set()
+        for conv, frac in iter_conversations(CONV_JSON):
+            existing = manifest.get(conv.get("conversation_id"))
+            pending.add(pool.submit(sort_conversation, conv, existing))
+            if len(pending) >= 4 * WORKERS:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    tally(future)
+        for future in as_completed(pending):
+            tally(future)
+    progress_bar(frac, done, note, force=True)
 
-        except Exception as e:
-            errors.append((title, str(e)))
-            progress_bar(idx, total, "❌ error")
+    write_json(MANIFEST, manifest)
 
     print(f"\n✅ Done. {updated} updated/added, {skipped} skipped, {len(errors)} errors.")
     for t, m in errors:
@@ -1,27 +1,46 @@
-import pathlib, json, time
+import json
 from pathlib import Path
-from selenium import webdriver
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # point to the chat.html inside GPTData
 THIS_DIR = Path(__file__).resolve().parent
 BASE_DIR = THIS_DIR.parent
 
-data_dir = BASE_DIR / "GPTData" 
+data_dir = BASE_DIR / "GPTData"
 html_path = data_dir / "chat.html"
 
-driver = webdriver.Chrome()
-driver.get(f"file://{html_path}")
+def extract_var(html: str, name: str, pos: int = 0):
+    """
+    Decodes the JSON literal assigned to `var <name> =` at or after pos in
+    chat.html; returns (value, end). raw_decode stops at the end of the
+    literal, so brackets inside message text can't cut it short the way
+    a regex would.
+    """
+    marker = f"var {name} ="
+    start = html.find(marker, pos)
+    if start < 0:
+        raise SystemExit(f"❌ {name} not found in {html_path}")
+    start += len(marker)
+    while html[start].isspace():
+        start += 1
+    return json.JSONDecoder().raw_decode(html, start)
 
-time.sleep(2)
+def dump(path: Path, obj) -> None:
+    if orjson:
+        path.write_bytes(orjson.dumps(obj))
+    else:
+        path.write_text(json.dumps(obj, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
 
-conversations = driver.execute_script("return jsonData;")
-assets        = driver.execute_script("return assetsJson;")
-driver.quit()
+html = html_path.read_text(encoding="utf-8")
+conversations, end = extract_var(html, "jsonData")
+assets, _          = extract_var(html, "assetsJson", end)
 
 # save into GPTData
-with open(data_dir / "conversations.json", "w", encoding="utf-8") as f:
-    json.dump(conversations, f, indent=2)
-with open(data_dir / "assets.json", "w", encoding="utf-8") as f:
-    json.dump(assets, f, indent=2)
+dump(data_dir / "conversations.json", conversations)
+dump(data_dir / "assets.json", assets)
 
 print("Extracted JSON successfully.")
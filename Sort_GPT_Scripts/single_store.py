@@ -1,9 +1,9 @@
-import json
-import re
-import shutil
+import os
 from pathlib import Path
-from slugify import slugify
-from html import unescape
+
+from sort_common import (read_json, write_json, clean, iter_conversations,
+                         extract_attachments, build_file_index, materialize,
+                         parse_conversation)
 
 # ── CONFIG ───────────────────────────────────────────────────────────
 
@@ -16,107 +16,17 @@ ASSETS_JSON = ROOT_DIR / "assets.json"
 
 SORTED_DIR  = BASE_DIR / "Sorted_GPT_Data"
 DELTA_DIR   = BASE_DIR / "delta"  # contains subdirs new_chats/ and appending/
-MAX_SLUG    = 80
 
 # ── UTIL FUNCTIONS ───────────────────────────────────────────────────
 
-def clean(name: str) -> str:
-    return slugify(name, max_length=MAX_SLUG) or "untitled"
-
-def extract_msgs(conv: dict, asset_map: dict) -> list[dict]:
-    msgs = []
-    mapping = conv.get("mapping", {})
-    node_id = conv.get("current_node")
-
-    while node_id:
-        node = mapping.get(node_id)
-        node_id = node.get("parent") if node else None
-        if not node:
-            break
-
-        msg = node.get("message")
-        if not msg:
-            continue
-
-        parts = msg.get("content", {}).get("parts") or []
-        if not parts:
-            continue
-
-        role = msg.get("author", {}).get("role")
-        if role in ("assistant", "tool"):
-            speaker = "assistant"
-        elif role == "user" or (role == "system" and msg.get("metadata", {}).get("is_user_system_message")):
-            speaker = "user"
-        else:
-            continue
-
-        texts = []
-        for part in parts:
-            if isinstance(part, str):
-                texts.append(part)
-            elif isinstance(part, dict):
-                if part.get("content_type") == "audio_transcription":
-                    texts.append(f"[Transcript]: {part.get('text','')}")
-                elif part.get("asset_pointer"):
-                    ptr = part["asset_pointer"]
-                    url = asset_map.get(ptr)
-                    fname = Path(url).name if url else None
-                    texts.append(f"[File]: {fname or 'MISSING'}")
-
-        content   = "\n\n".join(texts).strip()
-        timestamp = msg.get("create_time")
-        model     = msg.get("metadata", {}).get("model_slug")
-
-        msgs.append({
-            "role":      speaker,
-            "content":   content,
-            "timestamp": timestamp,
-            "model":     model
-        })
-
-    return list(reversed(msgs))
-
-
-def extract_attachments(messages: list[dict]) -> list[str]:
-    attachments = set()
-    for msg in messages:
-        for line in msg["content"].splitlines():
-            m = re.match(r"^\[File\]:\s*([\w .()\[\]\-]+)$", line)
-            if m:
-                attachments.add(m.group(1))
-            else:
-                break
-    return sorted(attachments)
-
-def find_file(filename: str, root: Path) -> Path | None:
-    return next(root.rglob(filename), None)
-
-def clean_content(messages: list[dict]) -> None:
-    for msg in messages:
-        msg["content"] = unescape(msg["content"]).replace("\uFFFD", "'")
-
-def group_messages(msgs: list[dict]) -> list[dict]:
-    if not msgs:
-        return []
-    grouped = []
-    curr = msgs[0].copy()
-    for m in msgs[1:]:
-        if m["role"] == curr["role"]:
-            # merge content but KEEP original timestamp+model
-            curr["content"] += "\n\n" + m["content"]
-        else:
-            grouped.append(curr)
-            curr = m.copy()
-    grouped.append(curr)
-    return grouped
-
 def find_existing_by_id(conv_id: str) -> Path | None:
-    for folder in SORTED_DIR.iterdir():
-        if folder.is_dir():
-            json_path = folder / f"{folder.name.split('--')[0]}.json"
-            if json_path.exists():
-                data = json.loads(json_path.read_text(encoding="utf-8"))
-                if data.get("id") == conv_id:
+    # folders are named <slug>--<id>, so no JSON needs to be opened to find it
+    suffix = f"--{conv_id}"
+    with os.scandir(SORTED_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(suffix) and entry.is_dir():
+                json_path = Path(entry.path) / f"{entry.name.split('--')[0]}.json"
+                if json_path.exists():
                     return json_path
     return None
 
@@ -130,6 +40,7 @@ def write_delta(slug: str,
                 create_time,
                 model,
                 is_append: bool,
+                file_index: dict[str, Path],
                 custom_slug: str = None):
     """
     Writes a delta JSON (same structure as sorted) and copies attachments.
@@ -140,9 +51,9 @@ def write_delta(slug: str,
     delta_folder.mkdir(parents=True, exist_ok=True)
     # copy attachments
     for fn in attachments:
-        src = find_file(fn, ROOT_DIR)
+        src = file_index.get(fn)
         if src:
-            shutil.copy(src, delta_folder / fn)
+            materialize(src, delta_folder / fn)
     # write JSON
     out_data = {
         "title":           title,
@@ -154,8 +65,7 @@ def write_delta(slug: str,
         "messages":        blocks
     }
     out_path = delta_folder / f"{slug_use}.json"
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(out_data, f, ensure_ascii=False, indent=2)
+    write_json(out_path, out_data)
     print(f"✅ Delta saved → {out_path.relative_to(DELTA_DIR.parent)}")
 
 # ── MAIN ──────────────────────────────────────────────────────────────
@@ -169,15 +79,19 @@ def main():
     (DELTA_DIR / "new_chats").mkdir(parents=True, exist_ok=True)
     (DELTA_DIR / "appending").mkdir(parents=True, exist_ok=True)
 
-    convs  = json.loads(CONV_JSON.read_text(encoding="utf-8"))
-    assets = json.loads(ASSETS_JSON.read_text(encoding="utf-8"))
+    assets = read_json(ASSETS_JSON)
+    # keep only title/id for the listing; the chosen conversations are
+    # streamed in again below, so the export is never held whole
+    convs  = [{k: c[k] for k in ("title", "id") if k in c}
+              for c, _ in iter_conversations(CONV_JSON)]
 
     # choose
     print("\nAvailable conversations:")
     for c in convs:
         print(f" - {c.get('title','untitled')} [{c.get('id','')[:4]}]")
     query   = input("\nEnter partial title or ID to store: ").strip().lower()
-    matches = [c for c in convs if query in (c.get("title") or "").lower() or query in c.get("id","")]
+    ids     = {c.get("id","") for c in convs if query in (c.get("title") or "").lower() or query in c.get("id","")}
+    matches = [c for c, _ in iter_conversations(CONV_JSON) if c.get("id","") in ids] if ids else []
     if not matches:
         print("❌ No matching conversation found.")
         return
@@ -201,10 +115,8 @@ def main():
     folder      = SORTED_DIR / slug_id
     out_json    = folder / f"{slug}.json"
 
-    msgs        = extract_msgs(target, assets)
-    clean_content(msgs)
-    msgs        = group_messages(msgs)
-    attachments = extract_attachments(msgs)
+    msgs, attachments = parse_conversation(target, assets)
+    file_index  = build_file_index(ROOT_DIR)
 
     # check existing
     old_path = find_existing_by_id(conv_id)
@@ -212,7 +124,7 @@ def main():
     force_save = False
     suffix = 1
     if old_path:
-        old_data = json.loads(old_path.read_text(encoding="utf-8"))
+        old_data = read_json(old_path)
         old_msgs = old_data.get("messages",[])
         if len(msgs) == len(old_msgs):
             print("✅ Conversation already stored. No new messages.")
@@ -227,10 +139,10 @@ def main():
             # update sorted
             old_data["messages"].extend(new_msgs)
             old_data["message_count"] = len(old_data["messages"])
-            with open(old_path, "w", encoding="utf-8") as f:
-                json.dump(old_data, f, ensure_ascii=False, indent=2)
+            write_json(old_path, old_data)
             # delta append
-            write_delta(slug, conv_id, new_msgs, new_atts, title, create_time, model, is_append=True)
+            write_delta(slug, conv_id, new_msgs, new_atts, title, create_time, model, is_append=True,
+                        file_index=file_index)
             print(f"✅ Appended {len(new_msgs)} new messages.")
             return
         else:
@@ -240,8 +152,8 @@ def main():
     # new or force-save
     folder.mkdir(parents=True, exist_ok=True)
     for fn in attachments:
-        src = find_file(fn, ROOT_DIR)
-        if src: shutil.copy(src, folder/fn)
+        src = file_index.get(fn)
+        if src: materialize(src, folder/fn)
         else: print(f"⚠️ Missing asset: {fn}")
 
     final_id = conv_id if not force_save else f"{conv_id}_{suffix}"
@@ -254,11 +166,11 @@ def main():
         "attachments":   attachments,
         "messages":      msgs
     }
-    with open(out_json, "w", encoding="utf-8") as f:
-        json.dump(out_data, f, ensure_ascii=False, indent=2)
+    write_json(out_json, out_data)
 
     custom = slug_id if not force_save else f"{slug_id}__{suffix}"
-    write_delta(slug, final_id, msgs, attachments, title, create_time, model, is_append=False, custom_slug=custom)
+    write_delta(slug, final_id, msgs, attachments, title, create_time, model, is_append=False,
+                file_index=file_index, custom_slug=custom)
     print(f"✅ Saved → {out_json.relative_to(SORTED_DIR.parent)}")
 
 if __name__ == "__main__":
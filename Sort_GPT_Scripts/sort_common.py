@@ -0,0 +1,226 @@
+"""Parsing and file helpers shared by GPTSort.py and single_store.py."""
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+from slugify import slugify
+from html import unescape
+
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is used otherwise
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # optional, conversations.json is loaded whole otherwise
+    ijson = None
+
+# ── CONFIG ───────────────────────────────────────────────────────────
+
+MAX_SLUG     = 80
+PRETTY       = os.environ.get("SORTGPT_PRETTY") == "1"  # indent output JSON
+FILE_PREFIX  = "[File]:"
+FILE_NAME_RE = re.compile(r"[\w .()\[\]\-]+")
+ASCII_TITLE_RE = re.compile(r"[A-Za-z0-9 _\-]+")
+SLUG_SEP_RE  = re.compile(r"[^a-z0-9]+")
+ROLE_MAP     = {"assistant": "assistant", "tool": "assistant", "user": "user"}
+REPLACEMENT_CHAR_TABLE = str.maketrans({"\uFFFD": "'"})
+
+# ── UTILS ────────────────────────────────────────────────────────────
+
+def read_json(path: Path):
+    data = path.read_bytes()
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def read_json_mapped(path: Path):
+    """read_json for the big export: orjson parses straight from a memory map."""
+    if not orjson:
+        return read_json(path)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            return orjson.loads(view)
+
+def dump_json(obj) -> bytes:
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if PRETTY else 0)
+    if PRETTY:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def write_bytes(path: Path, payload: bytes) -> bool:
+    """
+    Replaces path with payload via a temp file, so a crash never leaves a
+    half-written JSON. Returns False (and touches nothing) if the file
+    already holds exactly these bytes.
+    """
+    try:
+        if path.stat().st_size == len(payload) and path.read_bytes() == payload:
+            return False
+    except FileNotFoundError:
+        pass
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+    return True
+
+def write_json(path: Path, obj) -> bool:
+    return write_bytes(path, dump_json(obj))
+
+def iter_conversations(path: Path):
+    """
+    Yields (conversation, fraction_done) pairs. With ijson installed the
+    export is streamed, so only one conversation is held in memory.
+    """
+    if ijson is None:
+        convs = read_json_mapped(path)
+        for i, conv in enumerate(convs, 1):
+            yield conv, i / len(convs)
+        return
+    size = path.stat().st_size or 1
+    with open(path, "rb") as f:
+        for conv in ijson.items(f, "item", use_float=True):
+            yield conv, f.tell() / size
+
+def clean(name: str) -> str:
+    # plain ASCII titles slug the same as slugify() would, without its
+    # unidecode/entity/quote passes
+    if ASCII_TITLE_RE.fullmatch(name):
+        slug = SLUG_SEP_RE.sub("-", name.lower()).strip("-")[:MAX_SLUG].strip("-")
+    else:
+        slug = slugify(name, max_length=MAX_SLUG)
+    return slug or "untitled"
+
+def iter_msgs(conv: dict, asset_map: dict):
+    """Yields the messages of the current branch, root → leaf."""
+    mapping = conv.get("mapping", {})
+    node_id = conv.get("current_node")
+    # collect the branch leaf → root, then build messages root → leaf
+    chain = []
+    while node_id:
+        node = mapping.get(node_id)
+        if not node:
+            break
+        chain.append(node)
+        node_id = node.get("parent")
+    for node in reversed(chain):
+        msg = node.get("message")
+        if not msg:
+            continue
+        parts = msg.get("content", {}).get("parts") or []
+        if not parts:
+            continue
+        meta = msg.get("metadata") or {}
+        role = msg.get("author", {}).get("role")
+        speaker = ROLE_MAP.get(role)
+        if speaker is None:
+            if role == "system" and meta.get("is_user_system_message"):
+                speaker = "user"
+            else:
+                continue
+        texts = []
+        for part in parts:
+            if isinstance(part, str):
+                texts.append(part)
+            elif isinstance(part, dict):
+                if part.get("content_type") == "audio_transcription":
+                    texts.append(f"[Transcript]: {part.get('text','')}")
+                elif part.get("asset_pointer"):
+                    ptr = part["asset_pointer"]
+                    url = asset_map.get(ptr)
+                    fname = Path(url).name if url else None
+                    texts.append(f"[File]: {fname or 'MISSING'}")
+        content = "\n\n".join(texts).strip()
+        timestamp = msg.get("create_time")
+        model = meta.get("model_slug")
+        if model:
+            # a handful of slugs repeat across every message; share one str each
+            model = sys.intern(model)
+        yield {
+            "role": speaker,
+            "content": content,
+            "timestamp": timestamp,
+            "model": model
+        }
+
+def leading_files(content: str) -> list[str]:
+    """File names from the [File]: lines that open a message."""
+    if not content.startswith(FILE_PREFIX):
+        return []  # the usual case; don't split the whole message into lines
+    names = []
+    for line in content.splitlines():
+        if not line.startswith(FILE_PREFIX):
+            break
+        name = line[len(FILE_PREFIX):].lstrip()
+        if not FILE_NAME_RE.fullmatch(name):
+            break
+        names.append(name)
+    return names
+
+def extract_attachments(messages: list[dict]) -> list[str]:
+    attachments = set()
+    for msg in messages:
+        attachments.update(leading_files(msg["content"]))
+    return sorted(attachments)
+
+def build_file_index(root: Path) -> dict[str, Path]:
+    """Map each file name under root to its first path, in rglob order."""
+    index = {}
+    pending = [root]
+    while pending:
+        subdirs = []
+        with os.scandir(pending.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file():
+                    index.setdefault(entry.name, Path(entry.path))
+        pending.extend(reversed(subdirs))
+    return index
+
+def materialize(src: Path, dst: Path) -> None:
+    """Hardlinks src to dst, falling back to a copy across devices or on FAT."""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        if os.path.samefile(src, dst):
+            return
+        # unlink first so we never write through a link into another file
+        os.unlink(dst)
+        materialize(src, dst)
+    except OSError:
+        # data only: copyfile skips copy2's stat/chmod/utime and uses sendfile on Linux
+        shutil.copyfile(src, dst)
+
+def clean_text(content: str) -> str:
+    if "&" in content:
+        content = unescape(content)
+    if "\uFFFD" in content:
+        content = content.translate(REPLACEMENT_CHAR_TABLE)
+    return content
+
+def parse_conversation(conv: dict, asset_map: dict) -> tuple[list[dict], list[str]]:
+    """
+    One pass over the current branch that cleans each message, joins
+    consecutive messages of the same role with a blank line and collects
+    the [File]: attachments of the joined messages as it goes.
+    """
+    grouped = []
+    attachments = set()
+    head, chunks = None, []
+    for m in iter_msgs(conv, asset_map):
+        content = clean_text(m["content"])
+        if head is not None and m["role"] == head["role"]:
+            chunks.append(content)
+            continue
+        if head is not None:
+            grouped.append({**head, "content": "\n\n".join(chunks)})
+        head, chunks = m, [content]
+        # a group's leading [File]: lines all come from its first message
+        attachments.update(leading_files(content))
+    if head is not None:
+        grouped.append({**head, "content": "\n\n".join(chunks)})
+    return grouped, sorted(attachments)
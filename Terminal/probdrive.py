@@ -2,6 +2,9 @@
 # Minimal, pluggable LLM-command router with equal-length ("equal-mass") option.
 
 import os, sys, textwrap, random
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
 
 # -----------------------
 # 1) Replace this with your LLM provider call.
@@ -34,6 +37,7 @@ def llm(system_prompt: str, user_prompt: str, max_tokens: int = 300) -> str:
 # -----------------------
 # 2) Helpers
 # -----------------------
+@lru_cache(maxsize=1024)  # pure, and LLM replies / moments repeat
 def equalize_length(text: str, target_len: int) -> str:
     """Trim or softly pad to exactly target_len characters."""
     t = text.strip().replace("\n", " ")
@@ -46,20 +50,33 @@ def equalize_length(text: str, target_len: int) -> str:
     # Pad
     pad_needed = target_len - len(t)
     # Prefer one ellipsis then spaces
-    filler = (" …" if pad_needed >= 2 else " ")
-    while len(t) + len(filler) < target_len:
-        filler += " "
-    return (t + filler)[:target_len]
+    if pad_needed >= 2:
+        return t + " …" + " " * (pad_needed - 2)
+    return t + " "
 
 def single_line(s: str) -> str:
     return " ".join(s.strip().split())
 
+def as_is(resp: str, user_prompt: str) -> str:
+    return resp
+
+def equal_mass(resp: str, user_prompt: str) -> str:
+    return equalize_length(resp, len(user_prompt))
+
 # -----------------------
 # 3) Command registry
 #    Each command provides: name, description, system prompt template,
 #    whether to enforce equal-length, and a max_tokens hint.
 # -----------------------
-COMMANDS = {}
+@dataclass(slots=True)
+class Command:
+    description: str
+    system_template: str
+    enforce_equal: bool
+    max_tokens: int
+    post: Callable[[str, str], str]  # (response, user_prompt) -> final text
+
+COMMANDS: dict[str, Command] = {}
 
 def register_command(
     name: str,
@@ -68,12 +85,13 @@ def register_command(
     enforce_equal: bool = True,
     max_tokens: int = 300
 ):
-    COMMANDS[name] = {
-        "description": description,
-        "system_template": system_template,
-        "enforce_equal": enforce_equal,
-        "max_tokens": max_tokens,
-    }
+    COMMANDS[name] = Command(
+        description=description,
+        system_template=system_template,
+        enforce_equal=enforce_equal,
+        max_tokens=max_tokens,
+        post=equal_mass if enforce_equal else as_is,
+    )
 
 # --- Example commands ---
 
@@ -144,13 +162,11 @@ def run_command(cmd_name: str, moment: str) -> str:
     if cmd_name not in COMMANDS:
         return f"Unknown command: {cmd_name}"
     cfg = COMMANDS[cmd_name]
-    sys_prompt = cfg["system_template"]
+    sys_prompt = cfg.system_template
     user_prompt = moment.strip()
 
-    resp = llm(sys_prompt, user_prompt, max_tokens=cfg["max_tokens"]).strip()
-    if cfg["enforce_equal"]:
-        resp = equalize_length(resp, len(user_prompt))
-    return resp
+    resp = llm(sys_prompt, user_prompt, max_tokens=cfg.max_tokens).strip()
+    return cfg.post(resp, user_prompt)
 
 def main():
     print("Probability Drive CLI — minimal LLM router")
@@ -170,7 +186,7 @@ def main():
             break
         if raw == "list":
             for k, v in COMMANDS.items():
-                print(f"- {k}: {v['description']}")
+                print(f"- {k}: {v.description}")
             continue
         if raw.startswith("help"):
             parts = raw.split(maxsplit=1)
@@ -179,7 +195,7 @@ def main():
             else:
                 name = parts[1].strip()
                 if name in COMMANDS:
-                    print(f"{name}: {COMMANDS[name]['description']}")
+                    print(f"{name}: {COMMANDS[name].description}")
                 else:
                     print(f"Unknown command: {name}")
             continue
@@ -19,19 +19,12 @@ def detokenize(tokens: list[str]) -> str:
     """
     out = []
     for i, tok in enumerate(tokens):
-        if i == 0:
-            out.append(tok)
-            continue
-        # If current token is punctuation, no leading space.
-        if TOKEN_PATTERN.fullmatch(tok) and not tok.isalnum():
+        # Punctuation gets no leading space. isalnum() is checked first so
+        # ordinary word tokens never reach the regex engine.
+        if i == 0 or (not tok.isalnum() and TOKEN_PATTERN.fullmatch(tok)):
             out.append(tok)
         else:
-            # If previous token was punctuation (no trailing space), add space.
-            prev = out[-1]
-            if prev and TOKEN_PATTERN.fullmatch(prev) and not prev.isalnum():
-                out.append(" " + tok)
-            else:
-                out.append(" " + tok)
+            out.append(" " + tok)
     return "".join(out)
 
 # --- Core utilities ---
@@ -63,14 +56,14 @@ def interactive_token_writer(budget: int) -> str:
             # Finish on blank line
             break
 
-        # Add new line as tokens (we treat a newline as a space boundary)
-        new_tokens = tokenize(line)
         remaining = budget - len(composed_tokens)
-
         if remaining <= 0:
             print("[Budget Reached] Additional text will be ignored. Press Enter to finish.")
             continue
 
+        # Add new line as tokens (we treat a newline as a space boundary)
+        new_tokens = tokenize(line)
+
         if len(new_tokens) > remaining:
             # Truncate to fit
             fitting = new_tokens[:remaining]
@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from typing import Optional, List
 
-@dataclass
+@dataclass(slots=True)
 class BlockData:
     block: dict[str, any]   # {"user": "...", "assistant": "..."}
     universe: int
@@ -15,12 +15,14 @@ class BlockData:
             "block": self.block,
             "universe": self.universe
         }
-        if self.attachments is not None:
-            result["attachments"] = self.attachments
-        if self.data is not None:
-            result["data"] = self.data
-        if self.layers:
-            result["layers"] = self.layers
-        if self.connections is not None:
-            result["connections"] = self.connections
+        attachments, data, layers, connections = (
+            self.attachments, self.data, self.layers, self.connections)
+        if attachments is not None:
+            result["attachments"] = attachments
+        if data is not None:
+            result["data"] = data
+        if layers:
+            result["layers"] = layers
+        if connections is not None:
+            result["connections"] = connections
         return result
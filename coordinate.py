@@ -1,3 +1,11 @@
+SPAN = 60 ** 6  # addresses in one universe
+
+def _base60_digits(number):
+    """number mod 60**6 as six base-60 digits, least significant first."""
+    n = number % SPAN
+    return [n % 60, n // 60 % 60, n // 3600 % 60,
+            n // 216000 % 60, n // 12960000 % 60, n // 777600000]
+
 class Coordinate:
     # ── Init ───────────────────────────────────────────────────────────────────
     def __init__(self):
@@ -19,19 +27,11 @@ class Coordinate:
     def spec_change(self, value): self._update_coordinates(value)
 
     def _update_coordinates(self, delta):
-        for i in range(len(self.coordinates)):
-            self.coordinates[i] += delta
-            if delta > 0 and self.coordinates[i] == 60:
-                self.coordinates[i] = 0
-                if i == len(self.coordinates) - 1:
-                    self.universes += 1
-                continue
-            elif delta < 0 and self.coordinates[i] == -1:
-                self.coordinates[i] = 59
-                if i == len(self.coordinates) - 1:
-                    self.universes -= 1
-                continue
-            break
+        # one base-10 add instead of a digit-by-digit ripple; divmod floors,
+        # so negative deltas borrow from the universe counter too
+        q, r = divmod(self.baseTenConv() + delta, SPAN)
+        self.universes += q
+        self.coordinates[:] = _base60_digits(r)
 
     # ── Parsing / Formatting helpers ───────────────────────────────────────────
     @staticmethod
@@ -39,9 +39,15 @@ class Coordinate:
         if ' ' not in coord_str:
             raise ValueError("Invalid input. Expected space-separated coordinate.")
         parts = coord_str.split()
-        if len(parts) != 6 or not all(p.isdigit() and int(p) < 60 for p in parts):
+        if len(parts) != 6:
             raise ValueError("Each of the 6 numbers must be 0-59.")
-        return [int(x) for x in parts]
+        digits = []
+        for p in parts:                         # validate and convert in one pass
+            v = int(p) if p.isdigit() else 60
+            if v >= 60:
+                raise ValueError("Each of the 6 numbers must be 0-59.")
+            digits.append(v)
+        return digits
 
     def get_coordinates(self):
         return ' '.join(str(c) for c in self.coordinates)
@@ -53,27 +59,16 @@ class Coordinate:
     def baseTenConv(self, digits=None):
         if digits is None:
             digits = self.coordinates
+        if len(digits) == 6:                    # unrolled Horner for the usual width
+            d0, d1, d2, d3, d4, d5 = digits
+            return d0 + 60 * (d1 + 60 * (d2 + 60 * (d3 + 60 * (d4 + 60 * d5))))
         return sum(d * (60 ** i) for i, d in enumerate(digits))
 
     def strCoord_conv(self, number):
-        number %= 60 ** 6                       # ← 6-digit wrap
-        digits = []
-        while number:
-            digits.append(number % 60)
-            number //= 60
-        while len(digits) < 6:                  # ← pad to 6
-            digits.append(0)
-        return ' '.join(str(d) for d in digits)
+        return ' '.join(map(str, _base60_digits(number)))   # ← 6-digit wrap
 
     def coord_conv(self, number):
-        number %= 60 ** 6
-        digits = []
-        while number:
-            digits.append(number % 60)
-            number //= 60
-        while len(digits) < 6:                  # ← pad to 6
-            digits.append(0)
-        return digits
+        return _base60_digits(number)
 
     # ── Universe helpers ───────────────────────────────────────────────────────
     def get_univ(self):          return self.universes
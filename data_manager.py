@@ -1,9 +1,23 @@
 import os
 import json
 import shutil
-from typing import Dict, List, Optional
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 from block_data import BlockData
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is used otherwise
+    orjson = None
+
+
+def read_json(path: str):
+    """Whole file in one read, parsed with orjson when it's installed."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson else json.loads(data)
+
 
 class DataManager:
     """
@@ -33,9 +47,17 @@ class DataManager:
         self.attachments_source_dir = attachments_source_dir
 
         self.coordinate_dir = os.path.join(self.base_dir, "data")
-        os.makedirs(self.coordinate_dir, exist_ok=True)
+        self._made_dirs: set[str] = set()
+        self._pending: Optional[List[Tuple[str, BlockData]]] = None   # set inside batch()
+        self._ensure_dir(self.coordinate_dir)
 
     # ── Private helpers ───────────────────────────────────────────────────────
+    def _ensure_dir(self, path: str) -> None:
+        """os.makedirs, once per directory for the life of this manager."""
+        if path not in self._made_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._made_dirs.add(path)
+
     def _paths(self, coordinate: str) -> tuple[str, str, str, List[str]]:
         """
         Returns:
@@ -57,68 +79,144 @@ class DataManager:
     @staticmethod
     def _load_json(path: str) -> Dict:
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    print(f"⚠  {path} is corrupted – re-initialising.")
+            try:
+                return read_json(path)
+            except ValueError:
+                print(f"⚠  {path} is corrupted – re-initialising.")
         return {}
 
-    @staticmethod
-    def _write_json(path: str, data: Dict) -> None:
+    def _write_json(self, path: str, data: Dict) -> None:
         # Sort only the outermost keys (the coordinate keys)
         ordered = dict(sorted(data.items(), key=lambda x: x[0]))
+        if orjson:
+            payload = orjson.dumps(ordered, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(ordered, indent=2, ensure_ascii=False).encode("utf-8")
 
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(ordered, f, indent=4)
+        self._ensure_dir(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(payload)
 
-    # ── Core API ──────────────────────────────────────────────────────────────
-    def create_coordinate_block(self, coordinate: str, block: BlockData) -> None:
-        """
-        Stores the block under its full_key in the JSON file,
-        and copies attachments to the per-coordinate attachments folder.
-        """
-        json_path, full_key, dir_path, _ = self._paths(coordinate)
-        os.makedirs(dir_path, exist_ok=True)
-
-        # ── Attachments ─────────────────────────────────────────────────────
+    def _copy_attachments(self, full_key: str, dir_path: str, block: BlockData) -> None:
         if self.attachments_source_dir and getattr(block, "attachments", None):
             # new: replace spaces with dashes for filesystem-safe folder names
             sanitized_key = full_key.replace(" ", "-")
             att_dir = os.path.join(dir_path, "attachments", sanitized_key)
-            os.makedirs(att_dir, exist_ok=True)
+            self._ensure_dir(att_dir)
             for fname in block.attachments:
                 src = os.path.join(self.attachments_source_dir, fname)
                 dst = os.path.join(att_dir, fname)
                 if os.path.exists(src) and not os.path.exists(dst):
-                    shutil.copy2(src, dst)
+                    try:
+                        os.link(src, dst)       # attachments never change once stored
+                    except OSError:             # other device, or no hardlinks (FAT)
+                        shutil.copy2(src, dst)
                 elif not os.path.exists(src):
                     print(f"⚠  Attachment not found: {src}")
 
-        # ── Load existing data & append this block ───────────────────────────
-        data = self._load_json(json_path)
+    @staticmethod
+    def _add_block(data: Dict, full_key: str, block: BlockData) -> None:
         buckets = data.setdefault(full_key, [])
 
         # Prevent duplicate universes
         existing = [b.get("universe") for b in buckets]
+        top = max(existing) if existing else None
         if block.universe in existing:
-            block.universe = (max(existing) + 1) if existing else 0
+            block.universe = top + 1
 
+        # a universe past every stored one (the usual case, and every
+        # duplicate bump) can just be appended if the bucket is in order;
+        # save_coordinate_data and add_layer_to_coordinate don't keep it so
         buckets.append(block.to_dict())
-        buckets.sort(key=lambda b: b.get("universe"))
+        if existing and (block.universe < top or existing != sorted(existing)):
+            buckets.sort(key=lambda b: b.get("universe"))
 
+    @staticmethod
+    def _by_universe(blocks: List[Dict]) -> Dict:
+        """{universe: block} view of the same dicts."""
+        by_universe = {}
+        for b in blocks:
+            by_universe.setdefault(b.get("universe"), b)   # first match wins, as before
+        return by_universe
+
+    def _edit_coordinate_data(self, coordinate: str, edit) -> None:
+        """
+        load → edit(blocks) → save with a single read of {c5}.json
+        (load_coordinate_data + save_coordinate_data would parse it twice).
+        Nothing is written if edit returns False.
+        """
+        json_path, full_key, dir_path, _ = self._paths(coordinate)
+        data = self._load_json(json_path)
+        blocks = data.get(full_key, [])
+        if edit(blocks) is False:
+            return
+        self._ensure_dir(dir_path)
+        data[full_key] = blocks
         self._write_json(json_path, data)
 
+    # ── Core API ──────────────────────────────────────────────────────────────
+    def create_coordinate_block(self, coordinate: str, block: BlockData) -> None:
+        """
+        Stores the block under its full_key in the JSON file,
+        and copies attachments to the per-coordinate attachments folder.
+        Inside batch() the block is only queued.
+        """
+        if self._pending is not None:
+            self._pending.append((coordinate, block))
+            return
+        self.create_coordinate_blocks([(coordinate, block)])
+
+    @contextmanager
+    def batch(self):
+        """
+        with dm.batch(): create_coordinate_block calls are queued and each
+        touched {c5}.json is written once on exit, even if the block raises.
+        Queued blocks are not visible to the load_* methods until then. A
+        nested batch() leaves the flush to the outermost one.
+        """
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = []
+        try:
+            yield self
+        finally:
+            pending, self._pending = self._pending, None
+            if pending:
+                self.create_coordinate_blocks(pending)
+
+    def create_coordinate_blocks(self, items: List[Tuple[str, BlockData]]) -> None:
+        """
+        create_coordinate_block for many blocks at once: each {c5}.json
+        is loaded and written once, however many of the blocks land in it.
+        Blocks are applied in order, so the result matches one-by-one calls.
+        """
+        by_file = defaultdict(list)
+        for coordinate, block in items:
+            json_path, full_key, dir_path, _ = self._paths(coordinate)
+            self._ensure_dir(dir_path)
+            self._copy_attachments(full_key, dir_path, block)
+            by_file[json_path].append((full_key, block))
+
+        for json_path, blocks in by_file.items():
+            data = self._load_json(json_path)
+            for full_key, block in blocks:
+                self._add_block(data, full_key, block)
+            self._write_json(json_path, data)
+
     # ── Convenience wrappers ──────────────────────────────────────────────────
     def load_coordinate_data(self, coordinate: str) -> List[Dict]:
         json_path, full_key, _, _ = self._paths(coordinate)
         data = self._load_json(json_path)
         return data.get(full_key, [])
 
+    def load_coordinate_data_by_universe(self, coordinate: str) -> Dict:
+        """load_coordinate_data keyed by universe (first block wins on repeats)."""
+        return self._by_universe(self.load_coordinate_data(coordinate))
+
     def save_coordinate_data(self, coordinate: str, blocks: List[Dict]) -> None:
         json_path, full_key, dir_path, _ = self._paths(coordinate)
-        os.makedirs(dir_path, exist_ok=True)
+        self._ensure_dir(dir_path)
         data = self._load_json(json_path)
         data[full_key] = blocks
         self._write_json(json_path, data)
@@ -128,20 +226,19 @@ class DataManager:
 
     # ── Layer utilities ──────────────────────────────────────────────────────
     def add_layer_to_coordinate(self, coordinate: str, layer_data: Dict) -> None:
-        data = self.load_coordinate_data(coordinate)
-        data.append(layer_data)
-        self.save_coordinate_data(coordinate, data)
+        self._edit_coordinate_data(coordinate, lambda blocks: blocks.append(layer_data))
 
     def add_layer_to_universe(
         self, coordinate: str, universe: int, layer_level: int, layer_data: Dict
     ) -> None:
-        data = self.load_coordinate_data(coordinate)
-        for block in data:
-            if block.get("universe") == universe:
-                block.setdefault("layers", {})[str(layer_level)] = layer_data
-                self.save_coordinate_data(coordinate, data)
-                return
-        print(f"No universe {universe} at {coordinate} – layer not added.")
+        def add(blocks):
+            block = self._by_universe(blocks).get(universe)
+            if block is None:
+                print(f"No universe {universe} at {coordinate} – layer not added.")
+                return False
+            block.setdefault("layers", {})[str(layer_level)] = layer_data
+
+        self._edit_coordinate_data(coordinate, add)
 
     def get_layer_data_for_coordinate(self, coordinate: str, layer: int) -> Optional[Dict]:
         for block in self.load_coordinate_data(coordinate):
@@ -152,7 +249,4 @@ class DataManager:
     def get_layer_data_for_universe(
         self, coordinate: str, universe: int, layer: int
     ) -> Optional[Dict]:
-        for block in self.load_coordinate_data(coordinate):
-            if block.get("universe") == universe:
-                return block.get("layers", {}).get(str(layer))
-        return None
+        return self.load_coordinate_data_by_universe(coordinate).get(universe, {}).get("layers", {}).get(str(layer))
@@ -1,18 +1,22 @@
 import os
 import re
 import json
+import time
 import shutil
 import hashlib
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from block_data   import BlockData
 from coordinate   import Coordinate
-from data_manager import DataManager
+from data_manager import DataManager, read_json
 
 # ── Constants ──────────────────────────────────────────────────────
 M                 = 2**32
 A                 = 0x9E3779B9
 SPACE_SIZE        = 60**6  # 6D coordinate space
+_COORD            = Coordinate()  # stateless conversions only; shared, never mutated
 
 # ── Paths for persistence ─────────────────────────────────────────
 BASE_DIR          = Path(__file__).resolve().parent
@@ -25,51 +29,110 @@ CURRENT_PATH      = STATE_DIR / "current_coord.json"
 def load_index():
     if not INDEX_PATH.exists():
         return {}
-    with open(INDEX_PATH, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
+    try:
+        return read_json(INDEX_PATH)
+    except ValueError:
+        return {}
+
+def replace_text(path, text):
+    """Writes path through a temp file and os.replace, so it is never left half-written."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
 
 def save_index(index):
     STATE_DIR.mkdir(parents=True, exist_ok=True)
-    with open(INDEX_PATH, "w", encoding="utf-8") as f:
-        json.dump(index, f, indent=2)
+    replace_text(INDEX_PATH, json.dumps(index, indent=2))
 
 def load_current_coord():
     if not CURRENT_PATH.exists():
         return "0 0 0 0 0 0"
-    with open(CURRENT_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        return data.get("current", "0 0 0 0 0 0")
+    data = read_json(CURRENT_PATH)
+    return data.get("current", "0 0 0 0 0 0")
 
 def save_current_coord(coord):
     STATE_DIR.mkdir(parents=True, exist_ok=True)
-    with open(CURRENT_PATH, "w", encoding="utf-8") as f:
-        json.dump({"current": coord}, f)
+    replace_text(CURRENT_PATH, json.dumps({"current": coord}))
+
+def list_convo_dirs(root):
+    """Sub-folders of root in name order (scandir's cached is_dir, no stat per entry)."""
+    with os.scandir(root) as it:
+        dirs = [e for e in it if e.is_dir()]
+    dirs.sort(key=lambda e: os.path.normcase(e.name))   # Path ordering
+    return [Path(e.path) for e in dirs]
+
+def first_json(convo_dir):
+    """First *.json entry of convo_dir, the one convo_dir.glob("*.json") yields first."""
+    with os.scandir(convo_dir) as it:
+        return next((Path(e.path) for e in it
+                     if os.path.normcase(e.name).endswith(".json")), None)
+
+def load_convo(convo_dir):
+    """Parsed conversation JSON of convo_dir, or None if it has none."""
+    jf = first_json(convo_dir)
+    return read_json(jf) if jf else None
+
+def prefetch_convos(dirs, wanted, depth=2):
+    """
+    Yields (convo_dir, future) with load_convo running on a reader thread
+    up to depth folders ahead, so parsing the next conversation overlaps
+    storing this one. Folders wanted() rejects get None and aren't read.
+    """
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        window = deque()
+        for convo_dir in dirs:
+            window.append((convo_dir, reader.submit(load_convo, convo_dir)
+                                      if wanted(convo_dir) else None))
+            if len(window) > depth:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+
+def ask(prompt, env):
+    """input(prompt), unless the environment variable env answers it (scripted runs)."""
+    preset = os.environ.get(env)
+    if preset is not None:
+        print(f"{prompt}{preset}  (from {env})")
+        return preset.strip()
+    return input(prompt).strip()
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 # ── Default Navigation Path ────────────────────────────────────────
+def _step_kernel(coord_dec, imag, X, prev_const):
+    """
+    One DefaultPath step on plain ints, with the base-60 split and
+    coord_const inlined. prev_const is coord_const of coord_dec's digits;
+    returns (coord_dec, imag, digits, const) for the new coordinate, digits
+    least significant first, so const feeds the next step as prev_const.
+    """
+    n = (coord_dec*coord_dec - imag*imag + X) % SPACE_SIZE
+    digits = (n % 60, n // 60 % 60, n // 3600 % 60,
+              n // 216000 % 60, n // 12960000 % 60, n // 777600000)
+    d0, d1, d2, d3, d4, d5 = digits
+    curr_const = (d0*13 + d1*17 + d2*19 + d3*23 + d4*29 + d5*31) & 0xFFFFFFFF
+    return n, ((imag ^ prev_const ^ curr_const) * A + 1) & 0xFFFFFFFF, digits, curr_const
+
 class DefaultPath:
     def __init__(self, start_coord, key):
         if isinstance(start_coord, str):
             self.start_list = Coordinate.parse_coordinate(start_coord)
         else:
             self.start_list = start_coord
-        self.coord_dec = Coordinate().baseTenConv(self.start_list)
+        self.coord_dec = _COORD.baseTenConv(self.start_list)
         self.key       = key
         self.imag      = self.seed_imag(self.start_list, key)
         self.X         = self.seed_X(self.coord_dec, key)
+        self._const    = self.coord_const(_COORD.coord_conv(self.coord_dec))
 
     def seed_imag(self, coord_list, key):
-        start_str = Coordinate().strCoord_conv(self.coord_dec)
+        start_str = _COORD.strCoord_conv(self.coord_dec)
         h = hashlib.blake2b((start_str + "|" + key).encode(), digest_size=8).digest()
         return int.from_bytes(h, "big") % M
 
     def seed_X(self, coord_dec, key):
-        s = f"{coord_dec}|{key}".encode()
+        s = b"%d|%s" % (coord_dec, key.encode())
         h = hashlib.blake2b(s, digest_size=8).digest()
         return int.from_bytes(h, "big") % SPACE_SIZE
 
@@ -84,28 +147,42 @@ class DefaultPath:
         return (real*real - imag*imag + self.X) % SPACE_SIZE
 
     def step(self):
-        coord_inst = Coordinate()
-        prev       = coord_inst.coord_conv(self.coord_dec)
-        self.coord_dec = self.real_step(self.coord_dec, self.imag)
-        curr           = coord_inst.coord_conv(self.coord_dec)
-        coord_inst.coordinates = curr
-        self.imag = self.imag_step(prev, curr, self.imag)
-        return coord_inst.get_coordinates()
+        # same as real_step + imag_step over coord_conv digits, fused; the
+        # previous coordinate's const is carried over instead of re-derived
+        self.coord_dec, self.imag, curr, self._const = _step_kernel(
+            self.coord_dec, self.imag, self.X, self._const)
+        return ' '.join(map(str, curr))
+
+    def step_dec(self):
+        """step() without formatting the new coordinate; returns its coord_dec."""
+        self.coord_dec, self.imag, _, self._const = _step_kernel(
+            self.coord_dec, self.imag, self.X, self._const)
+        return self.coord_dec
+
+    def resume(self, coord_str, imag):
+        """Jumps to a point already on this path (coord_str with its imag)."""
+        digits         = Coordinate.parse_coordinate(coord_str)
+        self.coord_dec = _COORD.baseTenConv(digits)
+        self.imag      = imag
+        self._const    = self.coord_const(digits)
 
 # ── Utility: retrace to known end coordinate ────────────────────────
-def retrace_to_end(start_str, end_str, key):
+def retrace_to_end(start_str, end_str, key, end_imag=None):
     """
     Walks the DefaultPath from start_str until end_str, returning
-    (coord, imag, DefaultPath) at that final point.
+    (coord, imag, DefaultPath) at that final point. With end_imag (kept
+    in the index since it was added) the walk is skipped.
     """
     path = DefaultPath(start_coord=start_str, key=key)
-    coord = start_str
-    imag = path.imag
-    # iterate until we reach the stored end coordinate
-    while coord != end_str:
-        coord = path.step()
-        imag = path.imag
-    return coord, imag, path
+    if end_imag is not None:
+        path.resume(end_str, end_imag)
+        return end_str, end_imag, path
+    # iterate until we reach the stored end coordinate, comparing ints
+    # rather than formatting a string every step
+    end_dec = _COORD.baseTenConv(Coordinate.parse_coordinate(end_str))
+    while path.coord_dec != end_dec:
+        path.step_dec()
+    return end_str, path.imag, path
 
 # ── Mode 1: Store a single convo directory ───────────────────────────
 def store_conversation():
@@ -128,7 +205,8 @@ def store_conversation():
         print("Invalid choice.")
         return
 
-    subs = [p for p in base_dir.iterdir() if p.is_dir()]
+    with os.scandir(base_dir) as it:
+        subs = [Path(e.path) for e in it if e.is_dir()]
     if not subs:
         print(f"No conversations found in {base_dir}.")
         return
@@ -152,11 +230,10 @@ def store_conversation():
         confirm = input(f"\nSave conversation '{convo_dir.name}'? (y/n): ").strip().lower()
         if confirm != 'y': print("❌ Cancelled."); return
 
-    json_files = list(convo_dir.glob("*.json"))
-    if not json_files:
+    json_file = first_json(convo_dir)
+    if not json_file:
         print("❌ No JSON found."); return
-    with open(json_files[0], encoding="utf-8") as f:
-        convo = json.load(f)
+    convo = read_json(json_file)
 
     title = convo.get("title","untitled")
     conv_id = convo.get("id")
@@ -172,7 +249,7 @@ def store_conversation():
             return
         start_str = meta["start"]
         end_str = meta["end"]
-        coord, imag, nav = retrace_to_end(start_str, end_str, conv_id)
+        coord, imag, nav = retrace_to_end(start_str, end_str, conv_id, meta.get("end_imag"))
         current_coord = coord
         print(f"Appending to '{title}' from {current_coord} (imag: {imag})")
     else:
@@ -185,22 +262,25 @@ def store_conversation():
 
     # ── Store blocks along the path ────────────────────────────────────
     total_blocks = 0
-    for i in range(0, len(messages), 2):
-        user_msg = messages[i].get("content","")
-        bot_msg = messages[i+1].get("content","") if i+1<len(messages) else ""
-        used = [a for a in attachments if a in user_msg or a in bot_msg]
-        block = BlockData(block={"user":user_msg,"assistant":bot_msg}, universe=nav.imag, attachments=used)
-        dm.create_coordinate_block(current_coord, block)
-        total_blocks += 1
-
-        # advance
-        current_coord = nav.step()
+    try:
+        with dm.batch():  # each {c5}.json is written once, on exit
+            for i in range(0, len(messages), 2):
+                user_msg = messages[i].get("content","")
+                bot_msg = messages[i+1].get("content","") if i+1<len(messages) else ""
+                used = [a for a in attachments if a in user_msg or a in bot_msg]
+                block = BlockData(block={"user":user_msg,"assistant":bot_msg}, universe=nav.imag, attachments=used)
+                dm.create_coordinate_block(current_coord, block)
+                total_blocks += 1
+
+                # advance
+                current_coord = nav.step()
+    finally:
         save_current_coord(current_coord)
 
     end_str = current_coord
 
     # ── Update conversation index ──────────────────────────────────────
-    index[title] = {"id": conv_id, "start": start_str, "end": end_str}
+    index[title] = {"id": conv_id, "start": start_str, "end": end_str, "end_imag": nav.imag}
     sorted_index = dict(sorted(index.items(), key=lambda x: x[0].lower()))
     save_index(sorted_index)
 
@@ -239,8 +319,7 @@ def restore_conversation():
     coord, imag = start_str, path.imag
     blocks=[]
     while True:
-        blkset=dm.load_coordinate_data(coord)
-        b=next((b for b in blkset if b.get('universe')==imag),None)
+        b=dm.load_coordinate_data_by_universe(coord).get(imag)
         if not b: break
         blocks.append((coord,imag,b))
         coord = path.step()
@@ -299,10 +378,10 @@ def store_all_conversations():
     print("Select batch source:")
     print(" 1) Sorted_GPT_Data")
     print(" 2) delta folder (new_chats then appending)")
-    choice = input("Choice (1/2): ").strip()
+    choice = ask("Choice (1/2): ", "SML_BATCH_CHOICE")
 
     # helper to process a single folder
-    def process_folder(convo_dir, append=False):
+    def process_folder(convo_dir, append=False, pending=None):
         title = convo_dir.name
         # skip new if exists
         if not append and title in index:
@@ -312,12 +391,11 @@ def store_all_conversations():
         if append and title not in index:
             print(f"⚠️ Skipping '{title}' — no base convo to append.")
             return
-        # load JSON
-        jf = list(convo_dir.glob("*.json"))
-        if not jf:
+        # load JSON (usually already parsed by prefetch_convos)
+        convo = pending.result() if pending else load_convo(convo_dir)
+        if convo is None:
             print(f"❌ No JSON in {title}")
             return
-        convo = json.loads(jf[0].read_text(encoding="utf-8"))
         conv_id = convo.get("id")
         msgs = convo.get("messages", [])
         atts = convo.get("attachments", [])
@@ -327,7 +405,7 @@ def store_all_conversations():
             meta = index[title]
             start_str = meta["start"]
             end_str = meta["end"]
-            coord, imag, nav = retrace_to_end(start_str, end_str, conv_id)
+            coord, imag, nav = retrace_to_end(start_str, end_str, conv_id, meta.get("end_imag"))
             print(f"Appending '{title}' from {coord} (imag={imag})")
             current_coord = coord
         else:
@@ -338,16 +416,20 @@ def store_all_conversations():
 
         # store blocks
         dm = DataManager(base_dir=str(COORD_DATA_DIR), attachments_source_dir=str(convo_dir))
-        for i in range(0, len(msgs), 2):
-            user_msg = msgs[i].get("content", "")
-            bot_msg = msgs[i+1].get("content", "") if i+1 < len(msgs) else ""
-            used = [a for a in atts if a in user_msg or a in bot_msg]
-            block = BlockData(block={"user":user_msg,"assistant":bot_msg}, universe=nav.imag, attachments=used)
-            dm.create_coordinate_block(current_coord, block)
-            current_coord = nav.step()
+        try:
+            with dm.batch():
+                for i in range(0, len(msgs), 2):
+                    user_msg = msgs[i].get("content", "")
+                    bot_msg = msgs[i+1].get("content", "") if i+1 < len(msgs) else ""
+                    used = [a for a in atts if a in user_msg or a in bot_msg]
+                    block = BlockData(block={"user":user_msg,"assistant":bot_msg}, universe=nav.imag, attachments=used)
+                    dm.create_coordinate_block(current_coord, block)
+                    current_coord = nav.step()
+        finally:
             save_current_coord(current_coord)
         # update index end
         index[title]["end"] = current_coord
+        index[title]["end_imag"] = nav.imag
         # cleanup
         print(f"✅ {'Appended' if append else 'Stored'} '{title}' → {current_coord}")
         return current_coord
@@ -355,23 +437,41 @@ def store_all_conversations():
     # process sorted folder
     if choice == "1":
         root = BASE_DIR / "Sorted_GPT_Data"
-        for convo_dir in sorted(root.iterdir()):
-            if convo_dir.is_dir():
-                current = process_folder(convo_dir, append=False)
+        for convo_dir, pending in prefetch_convos(list_convo_dirs(root),
+                                                  lambda d: d.name not in index):
+            current = process_folder(convo_dir, append=False, pending=pending)
     # process delta
     elif choice == "2":
+        # processed delta folders are renamed into a per-run .trash dir
+        # (one metadata op each) and the whole pool is deleted once at the
+        # end; anything a crashed run left in .trash goes with it
+        trash_root = BASE_DIR / "delta" / ".trash"
+        trash = trash_root / str(time.time_ns())
+        def discard(convo_dir):
+            # new_chats and appending can hold the same title, so keep them apart
+            dest = trash / convo_dir.parent.name
+            try:
+                dest.mkdir(parents=True, exist_ok=True)
+                os.rename(convo_dir, dest / convo_dir.name)
+            except OSError as e:
+                print(f"⚠️ Could not remove {convo_dir}: {e}")
         # new chats
         new_root = BASE_DIR / "delta" / "new_chats"
-        for convo_dir in sorted(new_root.iterdir()):
-            if convo_dir.is_dir():
-                current = process_folder(convo_dir, append=False)
-                shutil.rmtree(convo_dir)
+        for convo_dir, pending in prefetch_convos(list_convo_dirs(new_root),
+                                                  lambda d: d.name not in index):
+            current = process_folder(convo_dir, append=False, pending=pending)
+            discard(convo_dir)
         # appending
         app_root = BASE_DIR / "delta" / "appending"
-        for convo_dir in sorted(app_root.iterdir()):
-            if convo_dir.is_dir():
-                current = process_folder(convo_dir, append=True)
-                shutil.rmtree(convo_dir)
+        for convo_dir, pending in prefetch_convos(list_convo_dirs(app_root),
+                                                  lambda d: d.name in index):
+            current = process_folder(convo_dir, append=True, pending=pending)
+            discard(convo_dir)
+        # delete in the background while the index is saved; the worker is
+        # joined before the interpreter exits
+        cleanup = ThreadPoolExecutor(max_workers=1)
+        cleanup.submit(shutil.rmtree, trash_root, ignore_errors=True)
+        cleanup.shutdown(wait=False)
     else:
         print("Invalid choice.")
         return
@@ -389,7 +489,7 @@ def main():
     print("2) restore     — replay a stored convo")
     print("3) recurse     — import all GPTSorted subfolders")
     print("4) browse      — interactive explore")
-    choice=input("Select mode (1-4):").strip()
+    choice=ask("Select mode (1-4):", "SML_MODE")
     if choice=='1': store_conversation()
     elif choice=='2': restore_conversation()
     elif choice=='3': store_all_conversations()